@@ -0,0 +1,259 @@
+"""
+Measure request throughput of the backend with different numbers of worker
+processes.
+
+Each run starts uvicorn in a scratch copy of the database and data directory,
+so the real leaderboard is never touched, and drives it from several client
+processes. Two workloads are measured:
+
+    read    GET /leaderboard and /top3
+    submit  POST /submit with a fresh name per request, which reserves a try,
+            runs the classifications through the scheduler and writes a row
+
+OpenAI is replaced by a local fake server (via OPENAI_BASE_URL) that answers
+every classification after a fixed delay, so no real API calls are made.
+
+Usage:
+    python benchmark.py --workers 1 2 4 --duration 10
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from auth import FIXED_PASSWORD
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Answers chat completions like the OpenAI API, after `latency` seconds"""
+
+    protocol_version = "HTTP/1.1"
+    latency = 0.02
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.latency)
+        body = json.dumps(
+            {
+                "id": "chatcmpl-benchmark",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": "gpt-4o",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {
+                            "role": "assistant",
+                            "content": json.dumps({"response": "Sticos"}),
+                        },
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": 100,
+                    "completion_tokens": 5,
+                    "total_tokens": 105,
+                    "prompt_tokens_details": {"cached_tokens": 0},
+                },
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_openai(latency: float) -> ThreadingHTTPServer:
+    """Start the fake OpenAI server on a free port in a background thread"""
+    FakeOpenAIHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAIHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def send_read(session: requests.Session, url: str, i: int) -> requests.Response:
+    path = "/leaderboard" if i % 2 == 0 else "/top3"
+    return session.get(url + path, timeout=30)
+
+
+def send_submit(session: requests.Session, url: str, i: int) -> requests.Response:
+    # A fresh name per request so the tries limit never rejects it
+    user = {
+        "name": f"bench-{uuid.uuid4().hex[:12]}",
+        "password": FIXED_PASSWORD,
+        "solution": "Spørsmål om skatt og avgift er Sticos, resten er SupportAI.",
+    }
+    return session.post(url + "/submit", json=user, timeout=60)
+
+
+WORKLOADS = {"read": send_read, "submit": send_submit}
+
+
+def client_loop(workload: str, url: str, deadline: float, counts) -> None:
+    """Send requests until the deadline and record how many succeeded"""
+    send = WORKLOADS[workload]
+    session = requests.Session()
+    ok = 0
+    errors = 0
+    i = 0
+    while time.time() < deadline:
+        try:
+            if send(session, url, i).status_code == 200:
+                ok += 1
+            else:
+                errors += 1
+        except requests.RequestException:
+            errors += 1
+        i += 1
+    counts.put((ok, errors))
+
+
+def wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(url + "/top3", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not start in time")
+
+
+def run(
+    workload: str,
+    workers: int,
+    clients: int,
+    duration: float,
+    port: int,
+    openai_url: str,
+) -> float:
+    """
+    Start the app with `workers` processes and measure requests per second
+
+    Returns:
+        Successful requests per second
+    """
+    scratch = tempfile.mkdtemp(prefix="bedpress-bench-")
+    db = os.path.join(BACKEND_DIR, "leaderboard.db")
+    if os.path.exists(db):
+        shutil.copy(db, scratch)
+    shutil.copytree(os.path.join(BACKEND_DIR, "data"), os.path.join(scratch, "data"))
+
+    env = dict(os.environ)
+    env["WEB_CONCURRENCY"] = str(workers)
+    env["PYTHONPATH"] = BACKEND_DIR
+    env["OPENAI_BASE_URL"] = openai_url
+    # The fake server ignores the key, but the client refuses to start without one
+    env["OPENAI_API_KEY"] = "benchmark"
+    env["TQDM_DISABLE"] = "1"
+
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ],
+        cwd=scratch,
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_ready(url)
+        # Give the remaining workers time to finish starting up
+        time.sleep(1.0)
+
+        counts = multiprocessing.Queue()
+        deadline = time.time() + duration
+        processes = [
+            multiprocessing.Process(
+                target=client_loop, args=(workload, url, deadline, counts)
+            )
+            for _ in range(clients)
+        ]
+        for process in processes:
+            process.start()
+        results = [counts.get() for _ in processes]
+        for process in processes:
+            process.join()
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    ok = sum(result[0] for result in results)
+    errors = sum(result[1] for result in results)
+    if errors:
+        print(f"  {errors} failed requests")
+    return ok / duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument(
+        "--workload", choices=list(WORKLOADS), nargs="+", default=list(WORKLOADS)
+    )
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--latency", type=float, default=0.02, help="Fake OpenAI delay in seconds"
+    )
+    args = parser.parse_args()
+
+    fake_openai = start_fake_openai(args.latency)
+    openai_url = f"http://127.0.0.1:{fake_openai.server_address[1]}/v1"
+
+    port = args.port
+    print(f"{os.cpu_count()} CPUs, {args.clients} clients, {args.duration}s per run")
+    for workload in args.workload:
+        baseline = None
+        print(f"\n{workload}")
+        print(f"{'workers':>8} {'req/s':>10} {'speedup':>8}")
+        for workers in args.workers:
+            # A fresh port per run, so a slow-exiting server from the previous
+            # run cannot answer for this one
+            port += 1
+            throughput = run(
+                workload,
+                workers,
+                args.clients,
+                args.duration,
+                port,
+                openai_url,
+            )
+            baseline = baseline or throughput
+            print(f"{workers:>8} {throughput:>10.1f} {throughput / baseline:>7.2f}x")
+
+    fake_openai.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import fcntl
+import os
+import time
+from typing import Callable, List, Optional
+
+# Number of uvicorn worker processes when started with `python main.py`;
+# uvicorn reads the same variable as the default for --workers
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+LOCK_DIR = os.getenv("LOCK_DIR", "locks")
+
+
+class ProcessSlots:
+    """
+    Counting semaphore shared by every worker process on the host, with one
+    lock file per slot. A slot is held with an exclusive flock, which the
+    kernel releases if the holding process dies.
+
+    Batch callers may only take the first `batch_limit` slots, so the
+    remaining slots stay free for interactive calls in any process.
+    """
+
+    def __init__(
+        self, count: int, batch_limit: int, name: str = "llm", lock_dir: str = LOCK_DIR
+    ):
+        os.makedirs(lock_dir, exist_ok=True)
+        self.paths: List[str] = [
+            os.path.join(lock_dir, f"{name}-{i}.lock") for i in range(max(1, count))
+        ]
+        self.batch_limit = max(1, min(batch_limit, len(self.paths)))
+
+    def acquire(
+        self, batch: bool = False, should_stop: Optional[Callable[[], bool]] = None
+    ) -> Optional[int]:
+        """
+        Block until a slot is free and take it
+
+        Args:
+            batch: Restrict to the slots batch work may use
+            should_stop: Checked between attempts; waiting is abandoned once
+                it returns True
+
+        Returns:
+            A file descriptor to pass to release()
+            None if `should_stop` ended the wait
+        """
+        # Interactive callers scan from the top so they leave batch slots free
+        if batch:
+            candidates = self.paths[: self.batch_limit]
+        else:
+            candidates = self.paths[::-1]
+
+        delay = 0.005
+        while True:
+            for path in candidates:
+                fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return fd
+                except BlockingIOError:
+                    os.close(fd)
+            if should_stop is not None and should_stop():
+                return None
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+    def release(self, fd: int) -> None:
+        """Give back a slot taken with acquire()"""
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
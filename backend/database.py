@@ -2,37 +2,152 @@ import sqlite3
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 
+DB_PATH = "leaderboard.db"
+
+TOKEN_COLUMNS = ("prompt_tokens", "cached_tokens", "completion_tokens")
+FINAL_TOKEN_COLUMNS = (
+    "final_prompt_tokens",
+    "final_cached_tokens",
+    "final_completion_tokens",
+)
+
+
+def connect() -> sqlite3.Connection:
+    """Open a connection that waits on locks held by other worker processes"""
+    return sqlite3.connect(DB_PATH, timeout=30)
+
 
 def init_db():
     """Initialize the database with required tables"""
-    conn = sqlite3.connect("leaderboard.db")
+    conn = connect()
+    conn.isolation_level = None
     cursor = conn.cursor()
 
-    # Create scores table with tries field
-    cursor.execute(
+    # WAL lets readers in one worker proceed while another worker writes
+    cursor.execute("PRAGMA journal_mode=WAL")
+
+    # Every worker process runs this on startup; the write lock makes them
+    # migrate one at a time, so each sees the schema the previous one left
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        # Create scores table with tries field
+        cursor.execute(
+            """
+        CREATE TABLE IF NOT EXISTS scores (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            score INTEGER NOT NULL,
+            finalScore INTEGER,
+            solution TEXT,
+            timestamp TEXT NOT NULL,
+            tries INTEGER DEFAULT 10
+        )
         """
-    CREATE TABLE IF NOT EXISTS scores (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        score INTEGER NOT NULL,
-        finalScore INTEGER,
-        solution TEXT,
-        timestamp TEXT NOT NULL,
-        tries INTEGER DEFAULT 10
-    )
+        )
+
+        # Token usage columns added after the first release, for the /submit
+        # evaluation and for the final /winner evaluation
+        cursor.execute("PRAGMA table_info(scores)")
+        columns = {row[1] for row in cursor.fetchall()}
+        for column in TOKEN_COLUMNS + FINAL_TOKEN_COLUMNS:
+            if column not in columns:
+                cursor.execute(
+                    f"ALTER TABLE scores ADD COLUMN {column} INTEGER DEFAULT 0"
+                )
+
+        # Tries used per user, reserved atomically before evaluating
+        cursor.execute(
+            """
+        CREATE TABLE IF NOT EXISTS attempts (
+            name TEXT PRIMARY KEY,
+            used INTEGER NOT NULL
+        )
+        """
+        )
+        cursor.execute(
+            """
+        INSERT OR IGNORE INTO attempts (name, used)
+        SELECT name, MAX(tries) FROM scores GROUP BY name
+        """
+        )
+
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    print("Database initialized successfully")
+
+
+def reserve_try(name: str, max_tries: int) -> Optional[int]:
     """
-    )
+    Atomically use up one of a user's tries. Safe across worker processes.
 
+    Args:
+        name: User's name
+        max_tries: Number of tries each user is allowed
+
+    Returns:
+        The number of the reserved try (1-based)
+        None if the user has no tries left
+    """
+    conn = connect()
+    conn.isolation_level = None
+    cursor = conn.cursor()
+    try:
+        # Take the write lock before reading so two workers cannot both
+        # see the same count
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT used FROM attempts WHERE name = ?", (name,))
+        row = cursor.fetchone()
+        used = row[0] if row else 0
+
+        if used >= max_tries:
+            cursor.execute("ROLLBACK")
+            return None
+
+        cursor.execute(
+            """
+            INSERT INTO attempts (name, used) VALUES (?, 1)
+            ON CONFLICT(name) DO UPDATE SET used = used + 1
+            """,
+            (name,),
+        )
+        cursor.execute("COMMIT")
+        return used + 1
+    except Exception:
+        if conn.in_transaction:
+            cursor.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def release_try(name: str) -> None:
+    """
+    Give back a try taken with reserve_try() when nothing was recorded for it
+
+    Args:
+        name: User's name
+    """
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute(
+        "UPDATE attempts SET used = MAX(used - 1, 0) WHERE name = ?",
+        (name,),
+    )
     conn.commit()
     conn.close()
 
-    print("Database initialized successfully")
-
 
 def save_submission(
     name: str,
     score: int,
+    tries: int,
     solution: Optional[str] = None,
+    usage: Optional[Dict[str, int]] = None,
 ) -> int:
     """
     Save a user submission to the database
@@ -40,26 +155,36 @@ def save_submission(
     Args:
         name: User's name
         score: The score achieved (1-5)
+        tries: The try number from reserve_try()
         solution: The user's solution text
+        usage: Prompt, cached and completion token counts of the evaluation
 
     Returns:
         The ID of the inserted record
     """
-    conn = sqlite3.connect("leaderboard.db")
+    conn = connect()
     cursor = conn.cursor()
     timestamp = datetime.now().isoformat()
 
-    # Check the current number of tries
+    usage = usage or {}
     cursor.execute(
-        "SELECT tries FROM scores WHERE name = ? ORDER BY timestamp DESC LIMIT 1",
-        (name,),
-    )
-    row = cursor.fetchone()
-    tries = row[0] + 1 if row else 1
-
-    cursor.execute(
-        "INSERT INTO scores (name, score, finalScore, solution, timestamp, tries) VALUES (?, ?, ?, ?, ?, ?)",
-        (name, score, 0, solution, timestamp, tries),
+        """
+        INSERT INTO scores (
+            name, score, finalScore, solution, timestamp, tries,
+            prompt_tokens, cached_tokens, completion_tokens
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            name,
+            score,
+            0,
+            solution,
+            timestamp,
+            tries,
+            usage.get("prompt_tokens", 0),
+            usage.get("cached_tokens", 0),
+            usage.get("completion_tokens", 0),
+        ),
     )
     last_id = cursor.lastrowid
     conn.commit()
@@ -71,6 +196,7 @@ def update_submission(
     name: str,
     solution: str,
     new_final_score: int,
+    usage: Optional[Dict[str, int]] = None,
 ) -> bool:
     """
     Update the final score for a user's submission
@@ -79,22 +205,36 @@ def update_submission(
         name: User's name
         solution: The user's solution text
         new_final_score: The final score achieved (0-100)
+        usage: Prompt, cached and completion token counts of the evaluation
 
     Returns:
         True if the update was successful, False otherwise
     """
-    conn = sqlite3.connect("leaderboard.db")
+    conn = connect()
     cursor = conn.cursor()
     timestamp = datetime.now().isoformat()
 
+    usage = usage or {}
+
     cursor.execute(
         """
         UPDATE scores
         SET finalScore = ?,
-            timestamp = ?
+            timestamp = ?,
+            final_prompt_tokens = ?,
+            final_cached_tokens = ?,
+            final_completion_tokens = ?
         WHERE name = ? AND solution = ?
         """,
-        (new_final_score, timestamp, name, solution),
+        (
+            new_final_score,
+            timestamp,
+            usage.get("prompt_tokens", 0),
+            usage.get("cached_tokens", 0),
+            usage.get("completion_tokens", 0),
+            name,
+            solution,
+        ),
     )
 
     conn.commit()
@@ -113,7 +253,7 @@ def get_leaderboard(limit: int = 10) -> List[Dict[str, Any]]:
     Returns:
         List of leaderboard entries
     """
-    conn = sqlite3.connect("leaderboard.db")
+    conn = connect()
     cursor = conn.cursor()
 
     cursor.execute(
@@ -139,7 +279,7 @@ def get_top_three() -> List[Dict[str, Any]]:
     Returns:
         List of top three entries
     """
-    conn = sqlite3.connect("leaderboard.db")
+    conn = connect()
     cursor = conn.cursor()
 
     cursor.execute(
@@ -2,15 +2,114 @@ import csv
 import os
 import json
 from typing import Dict, List, Tuple, Any, Optional
+import time
+import threading
+import concurrent.futures
 from models import OpenAIResponse
-import os
+from scheduler import get_scheduler, INTERACTIVE, LLM_CONCURRENCY
 from openai import OpenAI
+import httpx
 import tqdm
 
-client = OpenAI()
-OpenAI.api_key = os.getenv(
-    "OPENAI_API_KEY",
-)
+LLM_WARMUP_CONNECTIONS = int(os.getenv("LLM_WARMUP_CONNECTIONS", "0"))
+
+# Provider prompt caching only applies to prompts of roughly 1024 tokens or
+# more. Below this many characters there is nothing to warm up.
+PROMPT_CACHE_MIN_CHARS = int(os.getenv("PROMPT_CACHE_MIN_CHARS", "4000"))
+
+# Created on application startup by init_client(), or lazily on first use
+client: Optional[OpenAI] = None
+# Why the client could not be created, so later calls fail fast instead of
+# building and discarding a connection pool each time
+_client_error: Optional[Exception] = None
+_client_lock = threading.Lock()
+
+
+def init_client(concurrency: int = LLM_CONCURRENCY) -> OpenAI:
+    """
+    Create the shared OpenAI client with a keep-alive pool sized for the
+    configured concurrency
+
+    Args:
+        concurrency: Maximum number of simultaneous requests to the API
+
+    Returns:
+        The shared OpenAI client
+    """
+    global client, _client_error
+
+    with _client_lock:
+        if client is not None:
+            return client
+
+        # Sized to match the scheduler so its workers never queue on
+        # connection acquisition
+        http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=concurrency,
+                max_keepalive_connections=concurrency,
+                keepalive_expiry=60.0,
+            ),
+            timeout=httpx.Timeout(60.0, connect=10.0),
+        )
+        try:
+            client = OpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client
+            )
+        except Exception as e:
+            http_client.close()
+            _client_error = e
+            raise
+
+        _client_error = None
+        return client
+
+
+def get_client() -> OpenAI:
+    """
+    Return the shared OpenAI client, creating it on first use
+
+    Raises:
+        RuntimeError: If creating the client already failed
+    """
+    if client is not None:
+        return client
+    if _client_error is not None:
+        raise RuntimeError(f"OpenAI client unavailable: {_client_error}")
+    return init_client()
+
+
+def close_client() -> None:
+    """Close the shared OpenAI client and its connection pool"""
+    global client
+    if client is not None:
+        client.close()
+        client = None
+
+
+def warm_up_connections(count: int) -> float:
+    """
+    Open `count` pooled connections by issuing cheap concurrent requests,
+    so the first evaluations do not pay for TCP and TLS handshakes
+
+    Args:
+        count: Number of connections to open
+
+    Returns:
+        Seconds spent warming up
+    """
+    start = time.perf_counter()
+
+    def ping(_):
+        try:
+            get_client().models.list()
+        except Exception as e:
+            print(f"Exception when warming up OpenAI connection: {str(e)}")
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=count) as executor:
+        list(executor.map(ping, range(count)))
+
+    return time.perf_counter() - start
 
 
 def load_questions(filename: str) -> dict[str, str]:
@@ -30,61 +129,110 @@ def load_questions(filename: str) -> dict[str, str]:
     return questions
 
 
+def classify_question(user_input: str, question: str) -> Dict[str, Any]:
+    """
+    Classify a single question with the user's input as system prompt
+
+    The user's input always comes first and unchanged, so every call of an
+    evaluation shares the same prefix and can hit the provider's prompt cache.
+
+    Args:
+        user_input: The user's input text
+        question: The question to classify
+
+    Returns:
+        The classification returned by the model and the token usage
+    """
+    system_message = [
+        {
+            "role": "system",
+            "content": f"{user_input}",
+        },
+        {
+            "role": "user",
+            "content": f"{question}",
+        },
+    ]
+
+    # Make the API call using the openai package
+    response = get_client().beta.chat.completions.parse(
+        model="gpt-4o",
+        messages=system_message,
+        response_format=OpenAIResponse,
+        temperature=0.0,
+    )
+    usage = response.usage
+    details = getattr(usage, "prompt_tokens_details", None) if usage else None
+    return {
+        "classification": json.loads(response.choices[0].message.content)[
+            "response"
+        ],
+        "prompt_tokens": usage.prompt_tokens if usage else 0,
+        "cached_tokens": (details.cached_tokens or 0) if details else 0,
+        "completion_tokens": usage.completion_tokens if usage else 0,
+    }
+
+
 def call_openai_api(
-    user_input: str, questions: List[Tuple[str, str]]
-) -> Dict[str, Dict[str, str]]:
+    user_input: str,
+    questions: List[Tuple[str, str]],
+    priority: str = INTERACTIVE,
+    group: str = "",
+) -> Dict[str, Dict[str, Any]]:
     """
     Call the OpenAI API with the user's input and questions
 
+    For long prompts the first question is sent alone, so its response has
+    written the shared prefix to the provider's cache before the rest fan out.
+
     Args:
         user_input: The user's input text
         questions: List of (question, classification) tuples
+        priority: Scheduler priority for the calls, INTERACTIVE or BATCH
+        group: Fair-sharing key for batch calls
 
     Returns:
         The OpenAI API response as a dictionary, or None if the call fails
     """
+    questions = list(questions)
+    futures = []
+
+    def submit(question):
+        # Every classification goes through the shared scheduler
+        return get_scheduler().submit(
+            classify_question,
+            user_input,
+            question,
+            priority=priority,
+            group=group,
+        )
+
     try:
-        # Prepare messages for the API
+        if questions and len(user_input) >= PROMPT_CACHE_MIN_CHARS:
+            futures.append(submit(questions[0]))
+            futures[0].result()
+        for question in questions[len(futures) :]:
+            futures.append(submit(question))
+
         results = {}
-        # Add each question as a user message
-        for i, (question, _) in tqdm.tqdm(
-            enumerate(questions.items()), desc="Evaluating questions"
+        for i, (question, future) in tqdm.tqdm(
+            enumerate(zip(questions, futures)),
+            desc="Evaluating questions",
+            total=len(futures),
         ):
-            system_message = [
-                {
-                    "role": "system",
-                    "content": f"{user_input}",
-                },
-                {
-                    "role": "user",
-                    "content": f"{question}",
-                },
-            ]
-
-            # Make the API call using the openai package
-            response = client.beta.chat.completions.parse(
-                model="gpt-4o",
-                messages=system_message,
-                response_format=OpenAIResponse,
-                temperature=0.0,
-            )
-            classification = json.loads(response.choices[0].message.content)["response"]
-            # switch the word response to the question
-
-            results[str(i)] = {
-                "classification": classification,
-                "question": question,
-            }
+            results[str(i)] = {**future.result(), "question": question}
 
         return results
 
     except Exception as e:
+        for future in futures:
+            future.cancel()
         print(f"Exception when calling OpenAI API: {str(e)}")
         return None
 
 
 def parse_openai_response(
-    response: dict[str, dict[str, str]], questions: dict[str, str]
+    response: dict[str, dict[str, Any]], questions: dict[str, str]
 ) -> Dict[str, Dict[str, Any]]:
     """
     Parse the OpenAI API response to extract classifications and correctness
@@ -106,6 +254,9 @@ def parse_openai_response(
                 "question": question,
                 "classification": classification,
                 "correct": correct,
+                "prompt_tokens": value.get("prompt_tokens", 0),
+                "cached_tokens": value.get("cached_tokens", 0),
+                "completion_tokens": value.get("completion_tokens", 0),
             }
     except Exception as e:
         print(f"Exception when parsing OpenAI API response: {str(e)}")
@@ -114,19 +265,25 @@ def parse_openai_response(
     return results
 
 
-def evaluate(system_prompt: str, questions) -> Dict[str, Dict[str, Any]]:
+def evaluate(
+    system_prompt: str, questions, priority: str = INTERACTIVE, group: str = ""
+) -> Dict[str, Dict[str, Any]]:
     """
     Evaluate free text against known questions using OpenAI API.
     If API call fails, falls back to random classifications.
 
     Args:
         system_prompt: The free text input from the user
+        priority: Scheduler priority, INTERACTIVE or BATCH
+        group: Fair-sharing key for batch evaluations
 
     Returns:
         A dictionary mapping question keys to evaluation results
     """
 
-    response: dict[str, dict[str, str]] = call_openai_api(system_prompt, questions)
+    response: dict[str, dict[str, Any]] = call_openai_api(
+        system_prompt, questions, priority=priority, group=group
+    )
 
     # Parse the response
     if response:
@@ -1,5 +1,11 @@
+import time
+
+# Taken before the heavy imports so the startup report covers them
+PROCESS_START = time.perf_counter()
+
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from openai import OpenAIError
 import os
 
 # Import local modules
@@ -11,14 +17,67 @@ from database import (
     get_leaderboard,
     get_top_three,
     update_submission,
+    reserve_try,
+    release_try,
+    connect,
 )
 from test_evaluate import test_evaluate
 from utils import generate_test_questions, ensure_data_dir
-from evaluate import load_questions
-import sqlite3
+from evaluate import (
+    load_questions,
+    init_client,
+    close_client,
+    warm_up_connections,
+    LLM_WARMUP_CONNECTIONS,
+)
+from scheduler import (
+    init_scheduler,
+    get_scheduler,
+    shutdown_scheduler,
+    BATCH,
+    LLM_CONCURRENCY,
+)
+from coordination import WEB_CONCURRENCY
 import tqdm
 import concurrent.futures
 
+IMPORT_SECONDS = time.perf_counter() - PROCESS_START
+
+MAX_TRIES = 10
+
+# Cold start and first-request timings, filled in as the app starts up
+startup_timings: dict[str, float] = {"imports": IMPORT_SECONDS}
+
+
+
+class FirstRequestTimer:
+    """
+    ASGI middleware that records the latency of the first request served by
+    this process. Every later request only pays for one attribute check.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.recorded = False
+
+    async def __call__(self, scope, receive, send):
+        if self.recorded or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        self.recorded = True
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            startup_timings["first_request"] = time.perf_counter() - start
+            startup_timings["first_request_since_start"] = (
+                time.perf_counter() - PROCESS_START
+            )
+            print(
+                f"First request {scope['method']} {scope['path']} served in "
+                f"{startup_timings['first_request']:.3f}s"
+            )
+
 
 # Initialize the FastAPI app
 app = FastAPI(title="Leaderboard API")
@@ -31,15 +90,48 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(FirstRequestTimer)
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize everything needed on startup"""
+    start = time.perf_counter()
     init_db()
     ensure_data_dir()
     if not os.path.exists("data/test_questions.csv"):
         generate_test_questions()
+    startup_timings["database"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    try:
+        init_client(concurrency=LLM_CONCURRENCY)
+        llm_available = True
+    except OpenAIError as e:
+        # Without a key evaluations fall back to "?" results instead of the
+        # app failing to start
+        print(f"Exception when creating OpenAI client: {str(e)}")
+        llm_available = False
+    init_scheduler(concurrency=LLM_CONCURRENCY)
+    startup_timings["llm_client"] = time.perf_counter() - start
+
+    if llm_available and LLM_WARMUP_CONNECTIONS > 0:
+        startup_timings["llm_warmup"] = warm_up_connections(
+            min(LLM_WARMUP_CONNECTIONS, LLM_CONCURRENCY)
+        )
+
+    startup_timings["cold_start"] = time.perf_counter() - PROCESS_START
+    print(
+        "Startup timings: "
+        + ", ".join(f"{key}={value:.3f}s" for key, value in startup_timings.items())
+    )
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """Stop the scheduler and release the LLM connection pool"""
+    shutdown_scheduler()
+    close_client()
 
 
 # API Routes
@@ -60,8 +152,10 @@ async def login(user: User):
     return {"name": name}
 
 
+# Plain def so FastAPI runs it in its threadpool and concurrent submissions
+# wait on the scheduler instead of blocking the event loop
 @app.post("/submit", response_model=SubmissionResponse)
-async def submit_response(user: User):
+def submit_response(user: User):
     """Submit a solution and get evaluation results"""
     # Authenticate the user
     name = authenticate_user(user.name, user.password)
@@ -74,36 +168,36 @@ async def submit_response(user: User):
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Check the current number of tries
-    conn = sqlite3.connect("leaderboard.db")
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT tries FROM scores WHERE name = ? ORDER BY timestamp DESC LIMIT 1",
-        (name,),
-    )
-    row = cursor.fetchone()
-    tries = row[0] if row else 0
+    # Use up one try; atomic across worker processes
+    tries = reserve_try(name, MAX_TRIES)
 
-    if tries >= 10:
+    if tries is None:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Maximum number of tries exceeded",
         )
     check_questions = load_questions("data/check_questions.csv")
 
-    # Evaluate the solution
-    evaluation = test_evaluate(user.solution or "", check_questions)
-
-    # Save submission to database with both scores
-    save_submission(
-        name=name,
-        score=evaluation["score"],
-        solution=user.solution,
-    )
+    try:
+        # Evaluate the solution
+        evaluation = test_evaluate(user.solution or "", check_questions)
+
+        # Save submission to database with the score and token usage
+        save_submission(
+            name=name,
+            score=evaluation["score"],
+            solution=user.solution,
+            tries=tries,
+            usage=evaluation["usage"],
+        )
+    except Exception:
+        # Nothing was recorded, so the try does not count
+        release_try(name)
+        raise
 
     # Return the evaluation results
     response = SubmissionResponse(
-        score=evaluation["score"], results=evaluation["results"], num_uses=tries + 1
+        score=evaluation["score"], results=evaluation["results"], num_uses=tries
     )
     return response
 
@@ -112,7 +206,7 @@ async def submit_response(user: User):
 def get_winner():
     """Get the latest entry for each unique user"""
     # Connect to the database
-    conn = sqlite3.connect("leaderboard.db")
+    conn = connect()
     cursor = conn.cursor()
 
     # Get all unique users
@@ -144,11 +238,22 @@ def get_winner():
 
     def evaluate_entry(entry):
         """Evaluate a single entry."""
-        score = test_evaluate(entry["solution"], questions)["score"]
-        return {"name": entry["name"], "solution": entry["solution"], "score": score}
-
-    # Use ThreadPoolExecutor for parallel evaluation
-    with concurrent.futures.ThreadPoolExecutor() as executor:
+        evaluation = test_evaluate(
+            entry["solution"], questions, priority=BATCH, group=entry["name"]
+        )
+        return {
+            "name": entry["name"],
+            "solution": entry["solution"],
+            "score": evaluation["score"],
+            "usage": evaluation["usage"],
+        }
+
+    # The scheduler bounds the actual API calls and shares them fairly between
+    # the entries that have questions queued. Each thread queues a whole entry,
+    # so a small pool is enough to keep the scheduler busy.
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=max(1, min(len(latest_entries), LLM_CONCURRENCY))
+    ) as executor:
         results = list(
             tqdm.tqdm(
                 executor.map(evaluate_entry, latest_entries),
@@ -159,10 +264,12 @@ def get_winner():
 
     # Sequentially update the database with the results
     for result in results:
-        update_submission(result["name"], result["solution"], result["score"])
+        update_submission(
+            result["name"], result["solution"], result["score"], result["usage"]
+        )
 
     # Return the best finalScore per user
-    conn = sqlite3.connect("leaderboard.db")
+    conn = connect()
     cursor = conn.cursor()
     cursor.execute(
         """
@@ -201,8 +308,24 @@ async def get_top_three_route():
     ]
 
 
+@app.get("/startup")
+async def get_startup_timings():
+    """Get the cold start and first-request timings for this process"""
+    return {key: round(value, 4) for key, value in startup_timings.items()}
+
+
+@app.get("/scheduler")
+async def get_scheduler_stats():
+    """Get queue depth and wait times of the LLM scheduler"""
+    return get_scheduler().stats()
+
+
 # For running the app directly
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if WEB_CONCURRENCY > 1:
+        # Worker processes import the app themselves, so pass it by name
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=WEB_CONCURRENCY)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,239 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+from coordination import ProcessSlots
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+# Maximum number of LLM calls in flight across the whole process
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "16"))
+# Worker slots batch work may never take, so /submit always finds capacity
+LLM_INTERACTIVE_RESERVED = int(os.getenv("LLM_INTERACTIVE_RESERVED", "2"))
+
+
+class Scheduler:
+    """
+    Runs LLM classifications on a fixed pool of worker threads, which is the
+    single global limit on concurrent provider calls.
+
+    Interactive jobs are always picked first. Batch jobs only use spare
+    capacity and are taken round-robin across groups (one group per
+    leaderboard entry), so one large entry cannot starve the others.
+
+    Pass `slots` so every call also holds a host-wide slot and the limit
+    applies across all worker processes on the host.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = LLM_CONCURRENCY,
+        interactive_reserved: int = LLM_INTERACTIVE_RESERVED,
+        slots: Optional[ProcessSlots] = None,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.batch_limit = max(1, self.concurrency - max(0, interactive_reserved))
+        self.slots = slots
+
+        self._cond = threading.Condition()
+        self._interactive: deque = deque()
+        self._batch: "OrderedDict[str, deque]" = OrderedDict()
+        self._running = {INTERACTIVE: 0, BATCH: 0}
+        self._completed = {INTERACTIVE: 0, BATCH: 0}
+        self._cancelled = {INTERACTIVE: 0, BATCH: 0}
+        self._recent_waits = {INTERACTIVE: deque(maxlen=500), BATCH: deque(maxlen=500)}
+        self._stopped = False
+
+        self._workers = [
+            threading.Thread(target=self._work, name=f"llm-worker-{i}", daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        priority: str = INTERACTIVE,
+        group: str = "",
+    ) -> Future:
+        """
+        Queue a call to `fn(*args)`
+
+        Args:
+            fn: The function to run on a worker thread
+            priority: INTERACTIVE or BATCH
+            group: Fair-sharing key for batch jobs, e.g. the entry name
+
+        Returns:
+            A future holding the result of the call
+        """
+        future: Future = Future()
+        job = (future, fn, args, time.perf_counter())
+
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("Scheduler has been shut down")
+            if priority == BATCH:
+                self._batch.setdefault(group, deque()).append(job)
+            else:
+                self._interactive.append(job)
+            self._cond.notify()
+
+        return future
+
+    def _next_job(self) -> Optional[tuple]:
+        """Pick the next job to run, or None if nothing may run now"""
+        if self._interactive:
+            return INTERACTIVE, self._interactive.popleft()
+
+        if self._batch and self._running[BATCH] < self.batch_limit:
+            group, jobs = self._batch.popitem(last=False)
+            job = jobs.popleft()
+            if jobs:
+                # Move the group to the back of the round-robin
+                self._batch[group] = jobs
+            return BATCH, job
+
+        return None
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                picked = self._next_job()
+                while picked is None and not self._stopped:
+                    self._cond.wait()
+                    picked = self._next_job()
+                if picked is None:
+                    return
+                priority, (future, fn, args, enqueued) = picked
+                if not future.set_running_or_notify_cancel():
+                    # Cancelled while queued; it never ran, so it has no
+                    # wait time and does not count as completed
+                    self._cancelled[priority] += 1
+                    continue
+                self._running[priority] += 1
+                self._recent_waits[priority].append(time.perf_counter() - enqueued)
+
+            try:
+                slot = None
+                try:
+                    if self.slots is not None:
+                        slot = self.slots.acquire(
+                            batch=priority == BATCH, should_stop=self._is_stopped
+                        )
+                        if slot is None:
+                            raise RuntimeError("Scheduler has been shut down")
+                    future.set_result(fn(*args))
+                except BaseException as e:
+                    future.set_exception(e)
+                finally:
+                    if slot is not None:
+                        self.slots.release(slot)
+            finally:
+                with self._cond:
+                    self._running[priority] -= 1
+                    self._completed[priority] += 1
+                    # A freed batch slot may unblock a waiting worker
+                    self._cond.notify()
+
+    def _is_stopped(self) -> bool:
+        return self._stopped
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get queue depth, running jobs and wait times per priority
+
+        Returns:
+            A dictionary of scheduler statistics
+        """
+        with self._cond:
+            depth = {
+                INTERACTIVE: len(self._interactive),
+                BATCH: sum(len(jobs) for jobs in self._batch.values()),
+            }
+            result: Dict[str, Any] = {
+                "concurrency": self.concurrency,
+                "batch_limit": self.batch_limit,
+                "batch_groups": len(self._batch),
+            }
+            now = time.perf_counter()
+            for priority, queued in (
+                (INTERACTIVE, [self._interactive]),
+                (BATCH, list(self._batch.values())),
+            ):
+                waits = list(self._recent_waits[priority])
+                oldest = max(
+                    (now - jobs[0][3] for jobs in queued if jobs), default=0.0
+                )
+                result[priority] = {
+                    "queued": depth[priority],
+                    "running": self._running[priority],
+                    "completed": self._completed[priority],
+                    "cancelled": self._cancelled[priority],
+                    "avg_wait": round(sum(waits) / len(waits), 4) if waits else 0.0,
+                    "max_wait": round(max(waits), 4) if waits else 0.0,
+                    "oldest_queued": round(oldest, 4),
+                }
+            return result
+
+    def shutdown(self) -> None:
+        """Stop the workers and cancel everything still queued"""
+        with self._cond:
+            self._stopped = True
+            pending = list(self._interactive)
+            self._cancelled[INTERACTIVE] += len(self._interactive)
+            for jobs in self._batch.values():
+                pending.extend(jobs)
+                self._cancelled[BATCH] += len(jobs)
+            self._interactive.clear()
+            self._batch.clear()
+            self._cond.notify_all()
+
+        for future, _, _, _ in pending:
+            future.cancel()
+        for worker in self._workers:
+            worker.join()
+
+
+# Created on application startup by init_scheduler(), or lazily on first use
+scheduler: Optional[Scheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def init_scheduler(concurrency: int = LLM_CONCURRENCY) -> Scheduler:
+    """
+    Create the shared scheduler. Calls are always also limited host-wide
+    through lock-file slots, so the limit holds however many worker processes
+    uvicorn was started with.
+    """
+    global scheduler
+    with _scheduler_lock:
+        if scheduler is None:
+            slots = ProcessSlots(
+                count=concurrency,
+                batch_limit=concurrency - LLM_INTERACTIVE_RESERVED,
+            )
+            scheduler = Scheduler(concurrency=concurrency, slots=slots)
+        return scheduler
+
+
+def get_scheduler() -> Scheduler:
+    """Return the shared scheduler, creating it on first use"""
+    if scheduler is None:
+        return init_scheduler()
+    return scheduler
+
+
+def shutdown_scheduler() -> None:
+    """Stop the shared scheduler"""
+    global scheduler
+    with _scheduler_lock:
+        if scheduler is not None:
+            scheduler.shutdown()
+            scheduler = None
@@ -0,0 +1,53 @@
+import threading
+
+from coordination import ProcessSlots
+
+
+def test_batch_callers_stay_out_of_reserved_slots(tmp_path):
+    slots = ProcessSlots(count=3, batch_limit=1, lock_dir=str(tmp_path))
+
+    batch_slot = slots.acquire(batch=True)
+
+    # A second batch caller has to wait for the only batch slot...
+    acquired = []
+    waiter = threading.Thread(
+        target=lambda: acquired.append(slots.acquire(batch=True)), daemon=True
+    )
+    waiter.start()
+    waiter.join(0.2)
+    assert acquired == []
+
+    # ...while interactive callers still get the two reserved slots
+    interactive = [slots.acquire(), slots.acquire()]
+
+    slots.release(batch_slot)
+    waiter.join(2)
+    assert len(acquired) == 1
+
+    for fd in interactive + acquired:
+        slots.release(fd)
+
+
+def test_released_slots_can_be_taken_again(tmp_path):
+    slots = ProcessSlots(count=1, batch_limit=1, lock_dir=str(tmp_path))
+
+    for _ in range(3):
+        slots.release(slots.acquire())
+
+
+def test_acquire_gives_up_when_told_to_stop(tmp_path):
+    slots = ProcessSlots(count=1, batch_limit=1, lock_dir=str(tmp_path))
+    held = slots.acquire()
+
+    stop = threading.Event()
+    result = []
+    waiter = threading.Thread(
+        target=lambda: result.append(slots.acquire(should_stop=stop.is_set)),
+        daemon=True,
+    )
+    waiter.start()
+    stop.set()
+    waiter.join(2)
+
+    assert result == [None]
+    slots.release(held)
@@ -0,0 +1,128 @@
+import multiprocessing
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh database in a temporary working directory"""
+    monkeypatch.chdir(tmp_path)
+    database.init_db()
+    return tmp_path
+
+
+def reserve_in(directory: str, name: str, max_tries: int):
+    """Reserve a try from a separate process working in `directory`"""
+    os.chdir(directory)
+    return database.reserve_try(name, max_tries)
+
+
+def test_reserve_try_stops_at_max_tries(db):
+    assert [database.reserve_try("alice", 3) for _ in range(4)] == [1, 2, 3, None]
+    # Other users have their own count
+    assert database.reserve_try("bob", 3) == 1
+
+
+def test_release_try_gives_a_try_back(db):
+    assert database.reserve_try("alice", 2) == 1
+    assert database.reserve_try("alice", 2) == 2
+    assert database.reserve_try("alice", 2) is None
+
+    database.release_try("alice")
+    assert database.reserve_try("alice", 2) == 2
+
+
+def test_release_try_never_goes_below_zero(db):
+    database.reserve_try("alice", 10)
+    database.release_try("alice")
+    database.release_try("alice")
+    # Releasing for a user who never reserved is a no-op
+    database.release_try("bob")
+
+    assert database.reserve_try("alice", 10) == 1
+    assert database.reserve_try("bob", 10) == 1
+
+
+def test_init_db_backfills_attempts_from_old_scores(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    conn = sqlite3.connect("leaderboard.db")
+    conn.execute(
+        """
+        CREATE TABLE scores (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            score INTEGER NOT NULL,
+            finalScore INTEGER,
+            solution TEXT,
+            timestamp TEXT NOT NULL,
+            tries INTEGER DEFAULT 10
+        )
+        """
+    )
+    conn.executemany(
+        "INSERT INTO scores (name, score, finalScore, solution, timestamp, tries) VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            ("alice", 1, 0, "a", "2025-01-01T00:00:00", 3),
+            ("alice", 2, 0, "b", "2025-01-02T00:00:00", 7),
+            ("bob", 1, 0, "c", "2025-01-01T00:00:00", 10),
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+    database.init_db()
+    # Running it again must not overwrite the counts
+    database.reserve_try("alice", 10)
+    database.init_db()
+
+    assert database.reserve_try("alice", 10) == 9
+    assert database.reserve_try("bob", 10) is None
+
+
+def test_reserve_try_is_atomic_across_processes(db):
+    with multiprocessing.Pool(8) as pool:
+        results = pool.starmap(reserve_in, [(str(db), "alice", 10)] * 30)
+
+    assert sorted(r for r in results if r is not None) == list(range(1, 11))
+    assert results.count(None) == 20
+
+
+def test_save_submission_records_reserved_try(db):
+    tries = database.reserve_try("alice", 10)
+    database.save_submission(name="alice", score=3, tries=tries, solution="s")
+
+    conn = sqlite3.connect("leaderboard.db")
+    row = conn.execute("SELECT name, score, tries FROM scores").fetchone()
+    conn.close()
+    assert row == ("alice", 3, 1)
+
+
+def test_init_db_migrates_committed_database(tmp_path, monkeypatch):
+    shutil.copy(os.path.join(os.path.dirname(__file__), "leaderboard.db"), tmp_path)
+    monkeypatch.chdir(tmp_path)
+    new_columns = {
+        "prompt_tokens",
+        "cached_tokens",
+        "completion_tokens",
+        "final_prompt_tokens",
+        "final_cached_tokens",
+        "final_completion_tokens",
+    }
+
+    def columns():
+        conn = sqlite3.connect("leaderboard.db")
+        names = {row[1] for row in conn.execute("PRAGMA table_info(scores)")}
+        conn.close()
+        return names
+
+    assert not columns() & new_columns
+
+    database.init_db()
+    database.init_db()
+
+    assert new_columns <= columns()
@@ -1,33 +1,43 @@
 import csv
 import os
 import json
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 
 from evaluate import evaluate, load_questions
+from scheduler import INTERACTIVE
 
 
-def test_evaluate(freetext: str, questions) -> Dict[str, Any]:
+def test_evaluate(
+    freetext: str, questions, priority: str = INTERACTIVE, group: str = ""
+) -> Dict[str, Any]:
     """
     Test the evaluate function against expected results from CSV.
 
     Args:
         freetext: The free text to evaluate
+        priority: Scheduler priority, INTERACTIVE or BATCH
+        group: Fair-sharing key for batch evaluations
 
     Returns:
         A dictionary with evaluation results and test results
     """
     # Get evaluation results from OpenAI (or fallback)
-    eval_results = evaluate(freetext, questions)
+    eval_results = evaluate(freetext, questions, priority=priority, group=group)
 
     score = sum(result["correct"] for result in eval_results.values())
     test_results = [question["question"] for question in eval_results.values()]
+    usage = {
+        key: sum(result.get(key, 0) for result in eval_results.values())
+        for key in ("prompt_tokens", "cached_tokens", "completion_tokens")
+    }
 
-    save_evaluation_log(freetext, eval_results, score)
+    save_evaluation_log(freetext, eval_results, score, usage)
 
     return {
         "score": score,
         "results": eval_results,
         "test_details": test_results,
+        "usage": usage,
     }
 
 
@@ -35,6 +45,7 @@ def save_evaluation_log(
     freetext: str,
     results: Dict[str, Any],
     score: int,
+    usage: Optional[Dict[str, int]] = None,
 ) -> None:
     """
     Save the evaluation details to a log file for debugging.
@@ -43,6 +54,7 @@ def save_evaluation_log(
         freetext: The user's input text
         results: The evaluation results
         score: The final score (1-5)
+        usage: Total prompt, cached and completion tokens
     """
     os.makedirs("logs", exist_ok=True)
 
@@ -57,11 +69,15 @@ def save_evaluation_log(
             freetext[:500] + "..." if len(freetext) > 500 else freetext
         ),  # Truncate long inputs
         "score": score,
+        "usage": usage,
         "results": results,
     }
 
-    # Write to a JSON file
-    with open(f"logs/evaluation_{timestamp}.json", "w", encoding="utf-8") as f:
+    # Write to a JSON file; the pid keeps worker processes from clobbering
+    # each other's logs
+    with open(
+        f"logs/evaluation_{timestamp}_{os.getpid()}.json", "w", encoding="utf-8"
+    ) as f:
         json.dump(log_data, f, indent=2, ensure_ascii=False)
 
 
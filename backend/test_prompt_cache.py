@@ -0,0 +1,127 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import evaluate
+import main
+import scheduler
+from auth import FIXED_PASSWORD
+from scheduler import Scheduler
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class StubClient:
+    """Stands in for the OpenAI client and records when each call runs"""
+
+    usage = {"prompt_tokens": 100, "cached_tokens": 64, "completion_tokens": 5}
+
+    def __init__(self, latency: float = 0.02):
+        self.latency = latency
+        self.events = []
+        self._lock = threading.Lock()
+        self.beta = SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(parse=self.parse))
+        )
+
+    def parse(self, model, messages, response_format, temperature):
+        question = messages[1]["content"]
+        with self._lock:
+            self.events.append(("start", question))
+        time.sleep(self.latency)
+        with self._lock:
+            self.events.append(("end", question))
+
+        return SimpleNamespace(
+            choices=[
+                SimpleNamespace(
+                    message=SimpleNamespace(content=json.dumps({"response": "Sticos"}))
+                )
+            ],
+            usage=SimpleNamespace(
+                prompt_tokens=self.usage["prompt_tokens"],
+                completion_tokens=self.usage["completion_tokens"],
+                prompt_tokens_details=SimpleNamespace(
+                    cached_tokens=self.usage["cached_tokens"]
+                ),
+            ),
+        )
+
+
+@pytest.fixture
+def stub_client(monkeypatch):
+    stub = StubClient()
+    monkeypatch.setattr(evaluate, "get_client", lambda: stub)
+    return stub
+
+
+@pytest.fixture
+def local_scheduler(monkeypatch):
+    """A scheduler without host-wide slots, used instead of the shared one"""
+    local = Scheduler(concurrency=4, interactive_reserved=0)
+    monkeypatch.setattr(scheduler, "scheduler", local)
+    yield local
+    local.shutdown()
+
+
+QUESTIONS = {"q1": "Sticos", "q2": "SupportAI", "q3": "Sticos"}
+
+
+def test_long_prompt_sends_one_call_before_the_rest(stub_client, local_scheduler):
+    prompt = "x" * evaluate.PROMPT_CACHE_MIN_CHARS
+
+    evaluate.call_openai_api(prompt, QUESTIONS)
+
+    assert stub_client.events[:2] == [("start", "q1"), ("end", "q1")]
+    assert len(stub_client.events) == 2 * len(QUESTIONS)
+
+
+def test_short_prompt_fans_out_at_once(stub_client, local_scheduler):
+    prompt = "x" * (evaluate.PROMPT_CACHE_MIN_CHARS - 1)
+
+    evaluate.call_openai_api(prompt, QUESTIONS)
+
+    # Every call starts before the first one finishes
+    first_end = stub_client.events.index(("end", "q1"))
+    starts = [e for e in stub_client.events[:first_end] if e[0] == "start"]
+    assert len(starts) == len(QUESTIONS)
+
+
+@pytest.fixture
+def app_dir(tmp_path, monkeypatch):
+    """Run the app in a temporary directory with its own database"""
+    shutil.copytree(os.path.join(BACKEND_DIR, "data"), tmp_path / "data")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def token_counts(columns):
+    conn = sqlite3.connect("leaderboard.db")
+    row = conn.execute(
+        f"SELECT {', '.join(columns)} FROM scores WHERE name = 'alice'"
+    ).fetchone()
+    conn.close()
+    return row
+
+
+def test_token_usage_is_saved_for_submit_and_winner(app_dir, stub_client):
+    user = {"name": "alice", "password": FIXED_PASSWORD, "solution": "prompt"}
+    with TestClient(main.app) as client:
+        assert client.post("/submit", json=user).status_code == 200
+        submit_calls = len(evaluate.load_questions("data/check_questions.csv"))
+        assert token_counts(
+            ["prompt_tokens", "cached_tokens", "completion_tokens"]
+        ) == (100 * submit_calls, 64 * submit_calls, 5 * submit_calls)
+
+        assert client.post("/winner").status_code == 200
+        winner_calls = len(evaluate.load_questions("data/test_questions.csv"))
+        assert token_counts(
+            ["final_prompt_tokens", "final_cached_tokens", "final_completion_tokens"]
+        ) == (100 * winner_calls, 64 * winner_calls, 5 * winner_calls)
@@ -0,0 +1,169 @@
+import threading
+import time
+
+import pytest
+
+from coordination import ProcessSlots
+from scheduler import BATCH, INTERACTIVE, Scheduler
+
+
+def wait_for(condition, timeout: float = 2.0) -> None:
+    """Poll until `condition()` is true or fail after `timeout` seconds"""
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("Timed out waiting for condition")
+        time.sleep(0.005)
+
+
+def blocker(scheduler: Scheduler, priority: str = INTERACTIVE):
+    """Occupy one worker until the returned event is set"""
+    started = threading.Event()
+    release = threading.Event()
+
+    def run():
+        started.set()
+        release.wait(5)
+
+    future = scheduler.submit(run, priority=priority, group="blocker")
+    assert started.wait(2)
+    return future, release
+
+
+def test_interactive_jumps_ahead_of_queued_batch():
+    scheduler = Scheduler(concurrency=1, interactive_reserved=0)
+    order = []
+    try:
+        _, release = blocker(scheduler, priority=BATCH)
+        futures = [
+            scheduler.submit(order.append, "b1", priority=BATCH, group="a"),
+            scheduler.submit(order.append, "b2", priority=BATCH, group="a"),
+            scheduler.submit(order.append, "i1"),
+        ]
+        release.set()
+        for future in futures:
+            future.result(timeout=2)
+    finally:
+        scheduler.shutdown()
+
+    assert order == ["i1", "b1", "b2"]
+
+
+def test_batch_limit_leaves_capacity_for_interactive():
+    scheduler = Scheduler(concurrency=3, interactive_reserved=1)
+    release = threading.Event()
+    try:
+        batch = [
+            scheduler.submit(release.wait, 5, priority=BATCH, group=str(i))
+            for i in range(4)
+        ]
+        wait_for(lambda: scheduler.stats()[BATCH]["running"] == 2)
+        time.sleep(0.05)
+        stats = scheduler.stats()
+        assert stats["batch_limit"] == 2
+        assert stats[BATCH]["running"] == 2
+        assert stats[BATCH]["queued"] == 2
+
+        # The reserved worker still serves interactive work
+        assert scheduler.submit(lambda: "done").result(timeout=2) == "done"
+
+        release.set()
+        for future in batch:
+            future.result(timeout=2)
+    finally:
+        release.set()
+        scheduler.shutdown()
+
+
+def test_batch_groups_are_taken_round_robin():
+    scheduler = Scheduler(concurrency=1, interactive_reserved=0)
+    order = []
+    try:
+        _, release = blocker(scheduler)
+        futures = [
+            scheduler.submit(order.append, f"a{i}", priority=BATCH, group="a")
+            for i in range(3)
+        ]
+        futures += [
+            scheduler.submit(order.append, f"b{i}", priority=BATCH, group="b")
+            for i in range(2)
+        ]
+        release.set()
+        for future in futures:
+            future.result(timeout=2)
+    finally:
+        scheduler.shutdown()
+
+    assert order == ["a0", "b0", "a1", "b1", "a2"]
+
+
+def test_exceptions_reach_the_future():
+    scheduler = Scheduler(concurrency=1)
+
+    def fail():
+        raise ValueError("boom")
+
+    try:
+        future = scheduler.submit(fail)
+        with pytest.raises(ValueError, match="boom"):
+            future.result(timeout=2)
+        # The worker survives the exception
+        assert scheduler.submit(lambda: 1).result(timeout=2) == 1
+    finally:
+        scheduler.shutdown()
+
+
+def test_shutdown_cancels_queued_jobs():
+    scheduler = Scheduler(concurrency=1, interactive_reserved=0)
+    running, release = blocker(scheduler)
+    queued = [
+        scheduler.submit(lambda: None),
+        scheduler.submit(lambda: None, priority=BATCH, group="a"),
+    ]
+
+    threading.Timer(0.1, release.set).start()
+    scheduler.shutdown()
+
+    assert running.result(timeout=2) is None
+    assert all(future.cancelled() for future in queued)
+    with pytest.raises(RuntimeError):
+        scheduler.submit(lambda: None)
+
+
+def test_cancelled_jobs_are_not_counted_as_run():
+    scheduler = Scheduler(concurrency=1, interactive_reserved=0)
+    try:
+        _, release = blocker(scheduler)
+        cancelled = scheduler.submit(lambda: None)
+        assert cancelled.cancel()
+        release.set()
+        scheduler.submit(lambda: None).result(timeout=2)
+        wait_for(lambda: scheduler.stats()[INTERACTIVE]["running"] == 0)
+
+        stats = scheduler.stats()[INTERACTIVE]
+        # The blocker and the last job ran; the cancelled one did not
+        assert stats["completed"] == 2
+        assert stats["cancelled"] == 1
+        assert stats["running"] == 0
+    finally:
+        scheduler.shutdown()
+
+
+def test_shutdown_does_not_wait_for_slots_held_elsewhere(tmp_path):
+    slots = ProcessSlots(count=1, batch_limit=1, lock_dir=str(tmp_path))
+    # Stands in for another worker process holding the only slot
+    held = slots.acquire()
+
+    scheduler = Scheduler(concurrency=1, interactive_reserved=0, slots=slots)
+    ran = []
+    future = scheduler.submit(ran.append, "job")
+    wait_for(lambda: scheduler.stats()[INTERACTIVE]["running"] == 1)
+
+    start = time.time()
+    scheduler.shutdown()
+    assert time.time() - start < 2
+
+    with pytest.raises(RuntimeError):
+        future.result(timeout=2)
+    assert ran == []
+    slots.release(held)